@@ -0,0 +1,94 @@
+import re
+from collections import Counter
+
+import pytest
+
+from videogrep.videogrep import compile_search, search_line, convert_timespan, convert_timestamp, MultiTermSearch, get_ngrams, make_timecoder, clean_srt
+from videogrep.timecode import Timecode
+
+
+def write_srt(tmp_path, data, name='video'):
+    (tmp_path / (name + '.mp4')).write_bytes(b'')
+    srt = tmp_path / (name + '.srt')
+    srt.write_bytes(data)
+    return str(srt)
+
+
+def test_compile_search():
+    lines = ['a video here', 'the world', 'nothing', 'videos']
+    for search in ['video', 'vid.o|world', 'video|world']:
+        for searchtype in ['re', 'word']:
+            pattern = compile_search(search, searchtype)
+            for line in lines:
+                assert bool(search_line(line, pattern, searchtype)) == bool(re.search(search, line))
+
+
+def test_convert_timespan():
+    assert convert_timespan('00:01:03,250 --> 01:00:04,005') == (63.25, 3604.005)
+    assert convert_timespan('00:00:01,000-->00:00:02,500') == (1.0, 2.5)
+    assert convert_timestamp(' 00:00:01,500 ') == 1.5
+
+
+def test_multi_term_search():
+    pytest.importorskip('ahocorasick')
+    assert isinstance(compile_search('video|world', 'word'), MultiTermSearch)
+    assert not isinstance(compile_search('vid.o|world', 'word'), MultiTermSearch)
+    matcher = MultiTermSearch(['video', 'world', 'hello there'])
+    for line in ['a video here', 'the world', 'nothing', 'videos', 'hello there you', 'hello']:
+        assert matcher.search(line) == bool(re.search('video|world|hello there', line))
+
+
+def test_get_ngrams(tmp_path):
+    write_srt(tmp_path, b'1\n00:00:01,000 --> 00:00:02,000\nHello, video world.\n\n2\n00:00:03,000 --> 00:00:04,000\n"Hello video"!\n')
+    inputfile = [str(tmp_path / 'video.mp4')]
+    assert list(get_ngrams(inputfile, 1)) == [('Hello',), ('video',), ('world',), ('Hello',), ('video',)]
+    assert Counter(get_ngrams(inputfile, 2)) == Counter({('Hello', 'video'): 2, ('video', 'world'): 1, ('world', 'Hello'): 1})
+    assert list(get_ngrams(inputfile, 6)) == []
+
+
+def test_make_timecoder():
+    for fps in [25, 24.0, 23.976023976023978, 29.97002997002997, 30.0, 50, 59.94005994005994]:
+        timecode = make_timecoder(fps)
+        for seconds in [0, 0.01, 1.0 / fps, 1, 59.99, 3599.99, 3600, 86400 * 1.5, 12345.678, -0.3, -5]:
+            assert timecode(seconds) == str(Timecode(fps, start_seconds=seconds))
+
+
+def test_clean_srt(tmp_path):
+    srt = write_srt(tmp_path, b'1\n00:00:01,000 --> 00:00:02,500\nHello video\nworld.\n\n2\n00:00:03,000 --> 00:00:04,000\nSecond\n')
+    assert clean_srt(srt) == {
+        '00:00:01,000 --> 00:00:02,500': 'Hello video world.',
+        '00:00:03,000 --> 00:00:04,000': 'Second',
+    }
+
+
+def test_clean_srt_crlf_and_bom(tmp_path):
+    srt = write_srt(tmp_path, b'\xef\xbb\xbf1\r\n00:00:01,000 --> 00:00:02,000\r\nfoo\r\nbar\r\n\r\n2\r\n00:00:03,000 --> 00:00:04,000\r\nb\xc3\xa4r\r\n')
+    assert clean_srt(srt) == {
+        '00:00:01,000 --> 00:00:02,000': 'foo bar',
+        '00:00:03,000 --> 00:00:04,000': u'b\xe4r',
+    }
+
+
+def test_clean_srt_cr_only(tmp_path):
+    srt = write_srt(tmp_path, b'1\r00:00:01,000 --> 00:00:02,000\rHello\r\r2\r00:00:03,000 --> 00:00:04,000\rWorld\r')
+    assert clean_srt(srt) == {
+        '00:00:01,000 --> 00:00:02,000': 'Hello',
+        '00:00:03,000 --> 00:00:04,000': 'World',
+    }
+
+
+def test_clean_srt_whitespace_separators(tmp_path):
+    srt = write_srt(tmp_path, b'1\n00:00:01,000 --> 00:00:02,000\nHello\n \t\n2\n00:00:03,000 --> 00:00:04,000\nWorld\n3\n00:00:05,000 --> 00:00:06,000\nAgain\n')
+    assert clean_srt(srt) == {
+        '00:00:01,000 --> 00:00:02,000': 'Hello',
+        '00:00:03,000 --> 00:00:04,000': 'World',
+        '00:00:05,000 --> 00:00:06,000': 'Again',
+    }
+
+
+def test_clean_srt_keeps_numbers_and_continued_text(tmp_path):
+    srt = write_srt(tmp_path, b'1\n00:00:01,000 --> 00:00:02,000\nfoo\n\nstill foo\n\n2\n00:00:03,000 --> 00:00:04,000\n42\n')
+    assert clean_srt(srt) == {
+        '00:00:01,000 --> 00:00:02,000': 'foo still foo',
+        '00:00:03,000 --> 00:00:04,000': '42',
+    }
@@ -0,0 +1,80 @@
+import io
+
+from videogrep.vtt import parse_auto_sub, parse_auto_sub_iter
+
+
+CUED = """WEBVTT
+Kind: captions
+
+00:00:00.000 --> 00:00:02.000 align:start position:0%
+
+hello<00:00:00.500><c> world</c><00:00:01.000><c> foo</c>
+
+00:00:01.900 --> 00:00:02.010 align:start position:0%
+hello world foo
+
+00:00:01.900 --> 00:00:04.000 align:start position:0%
+hello world foo
+bar<00:00:02.500><c> baz</c>
+"""
+
+CUED_SENTENCES = [
+    {
+        'text': 'hello world foo',
+        'words': [
+            {'word': 'hello', 'start': 0.0, 'end': 0.5},
+            {'word': 'world', 'start': 0.5, 'end': 1.0},
+            {'word': 'foo', 'start': 1.0, 'end': 1.9},
+        ],
+        'start': 0.0,
+        'end': 2.0,
+    },
+    {
+        'text': 'bar baz',
+        'words': [
+            {'word': 'bar', 'start': 1.9, 'end': 2.5},
+            {'word': 'baz', 'start': 2.5, 'end': 4.0},
+        ],
+        'start': 1.9,
+        'end': 4.0,
+    },
+]
+
+PLAIN = """WEBVTT
+
+00:00:00.000 --> 00:00:02.000
+Hello there
+friend
+
+00:00:02.000 --> 00:00:03.000
+Second
+"""
+
+PLAIN_SENTENCES = [
+    {'text': 'Hello there friend', 'start': 0.0, 'end': 2.0},
+    {'text': 'Second', 'start': 2.0, 'end': 3.0},
+]
+
+
+def test_parse_auto_sub_cued():
+    assert parse_auto_sub(CUED) == CUED_SENTENCES
+
+
+def test_parse_auto_sub_iter_cued():
+    assert list(parse_auto_sub_iter(io.StringIO(CUED))) == CUED_SENTENCES
+
+
+def test_parse_auto_sub_plain():
+    assert parse_auto_sub(PLAIN) == PLAIN_SENTENCES
+
+
+def test_parse_auto_sub_iter_plain():
+    assert list(parse_auto_sub_iter(io.StringIO(PLAIN))) == PLAIN_SENTENCES
+
+
+def test_parse_auto_sub_iter_crlf():
+    assert list(parse_auto_sub_iter(io.StringIO(PLAIN.replace('\n', '\r\n'), newline=''))) == PLAIN_SENTENCES
+
+
+def test_parse_auto_sub_empty():
+    assert list(parse_auto_sub_iter(io.StringIO('WEBVTT\n'))) == [{'text': '', 'start': None, 'end': None}]
@@ -3,75 +3,170 @@ from __future__ import print_function
 import os
 import re
 import random
-import gc
+import codecs
+import functools
+import multiprocessing.util
+import shutil
 import subprocess
-from glob import glob
-from collections import OrderedDict
+import tempfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from itertools import chain
+
+try:
+    from itertools import pairwise
+except ImportError:
+    # python < 3.10
+    def pairwise(iterable):
+        iterator = iter(iterable)
+        previous = next(iterator, None)
+        for item in iterator:
+            yield previous, item
+            previous = item
 
 from moviepy.editor import VideoFileClip, concatenate
+from moviepy.config import get_setting
 import audiogrep
 
-from .vtt import parse_auto_sub
-from .timecode import Timecode
+from .vtt import parse_auto_sub_iter
 from . import searcher
 
 usable_extensions = ['mp4', 'avi', 'mov', 'mkv', 'm4v']
 BATCH_SIZE = 20
+FFMPEG_BINARY = get_setting('FFMPEG_BINARY')
 
+# srt timestamps ("00:01:02,345") and timespans ("<timestamp> --> <timestamp>")
+_TIMESTAMP_RE = re.compile(r'(\d+):(\d+):(\d+),(\d+)')
+_TIMESPAN_RE = re.compile(r'\s*(\d+):(\d+):(\d+),(\d+)\s*-->\s*(\d+):(\d+):(\d+),(\d+)')
 
+# punctuation that separates words when counting ngrams
+_DELIM_TABLE = str.maketrans({c: ' ' for c in '.?!,:"'})
+
+
+def run_ffprobe(filename):
+    """Return the first video and audio stream and the format entries of a
+    video as reported by a single ffprobe call.
+    """
+    try:
+        output = subprocess.run(['ffprobe', '-v', 'error', '-show_entries', 'stream=codec_type,codec_name,width,height,avg_frame_rate,r_frame_rate,sample_rate,channels:format=duration', '-of', 'default', filename], stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True).stdout
+    except OSError:
+        print("[!] Could not run ffprobe.")
+        return {}
+
+    entries = {}
+    section = {}
+    for line in output.splitlines():
+        line = line.strip()
+        if line.startswith('[/'):
+            name = 'format' if line == '[/FORMAT]' else section.get('codec_type')
+            if name is not None and name not in entries:
+                entries[name] = section
+            section = {}
+        elif line.startswith('['):
+            section = {}
+        else:
+            key, sep, value = line.partition('=')
+            if sep:
+                section[key] = value
+    return entries
+
+
+@functools.lru_cache(maxsize=None)
+def probe_video(filename):
+    """Probe a source video with ffprobe, caching the result per file."""
+    return run_ffprobe(filename)
+
+
+def probe_many(filenames, cache=True):
+    """Probe several videos with concurrent ffprobe processes and return
+    their entries by filename. Unless cache is False, the results are kept
+    in the probe_video cache; files written during this run shouldn't be.
+    """
+    filenames = list(set(filenames))
+    with ThreadPoolExecutor(max_workers=os.cpu_count()) as executor:
+        return dict(zip(filenames, executor.map(probe_video if cache else run_ffprobe, filenames)))
+
+
+@functools.lru_cache(maxsize=None)
 def get_fps(filename):
-    output = subprocess.run(['ffmpeg', '-i', filename], stdout=subprocess.PIPE, stderr=subprocess.STDOUT,text=True).stdout
-    match = re.search(r'([\d.]+) fps', output, flags=re.MULTILINE)
+    """Determine the video frame rate using ffprobe"""
     try:
-        return float(match.group(1))
+        video = probe_video(filename)['video']
+        # avg_frame_rate is the "fps" ffmpeg reports; it is 0/0 if unknown
+        rate = video.get('avg_frame_rate', '0/0')
+        if rate == '0/0':
+            rate = video['r_frame_rate']
+        num, den = rate.split('/')
+        return float(num) / float(den)
     except:
         print("[!] Could not detect FPS; defaulting to 25.")
         return 25
 
+@functools.lru_cache(maxsize=None)
 def get_duration(filename):
     """Determine the video length in seconds using ffprobe"""
-    output = subprocess.run(['ffprobe', '-v', 'error', '-show_entries', 'format=duration', '-of', 'default=noprint_wrappers=1:nokey=1', filename], stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True).stdout
-    print(f"Output: {output}")
-    return float(output)
+    return float(probe_video(filename)['format']['duration'])
 
 
-def get_ngrams(inputfile, n=1, use_transcript=False, use_vtt=False):
-    '''
-    Get ngrams from a text
-    Sourced from:
-    https://gist.github.com/dannguyen/93c2c43f4e65328b85af
-    '''
-
-    words = []
+def get_words(inputfile, use_transcript=False, use_vtt=False):
+    '''Yield the words of the transcripts, vtt or srt files one at a time'''
     if use_transcript:
         for s in audiogrep.convert_timestamps(inputfile):
             for w in s['words']:
-                words.append(w[0])
+                yield w[0]
     elif use_vtt:
         vtts = get_vtt_files(inputfile)
         for vtt in vtts:
             with open(vtt['vtt'], 'r') as infile:
-                sentences = parse_auto_sub(infile.read())
-            for s in sentences:
-                for w in s['words']:
-                    words.append(w['word'])
+                for s in parse_auto_sub_iter(infile):
+                    for w in s['words']:
+                        yield w['word']
     else:
-        text = ''
         srts = get_subtitle_files(inputfile)
         for srt in srts:
             lines = clean_srt(srt)
-            if lines:
-                for timespan in lines.keys():
-                    line = lines[timespan].strip()
-                    text += line + ' '
+            for line in lines.values():
+                for word in line.translate(_DELIM_TABLE).split():
+                    yield word
+
+
+def get_ngrams(inputfile, n=1, use_transcript=False, use_vtt=False):
+    '''
+    Get ngrams from a text
+    Sourced from:
+    https://gist.github.com/dannguyen/93c2c43f4e65328b85af
+    '''
 
-        words = re.split(r'[.?!,:\"]+\s*|\s+', text)
+    # slide a window of n words over the text instead of holding it all
+    window = deque(maxlen=n)
+    for word in get_words(inputfile, use_transcript, use_vtt):
+        window.append(word)
+        if len(window) == n:
+            yield tuple(window)
 
-    ngrams = zip(*[words[i:] for i in range(n)])
-    return ngrams
+
+@functools.lru_cache(maxsize=None)
+def make_timecoder(fps):
+    """Return a function that formats seconds exactly like
+    str(Timecode(fps, start_seconds=seconds)), with the fps dependent
+    constants computed only once per frame rate.
+    """
+    ifps = int(fps)
+    frames_per_24_hours = int(round(float(fps) * 60 * 60)) * 24
+
+    def timecode(seconds):
+        frames = int(seconds * ifps)
+        if frames == 0:
+            return '00:00:00:00'
+        frame_number = (frames - 1) % frames_per_24_hours
+        total_seconds, frs = divmod(frame_number, ifps)
+        return '%02d:%02d:%02d:%02d' % (total_seconds // 3600, (total_seconds // 60) % 60, total_seconds % 60, frs)
+
+    return timecode
 
 
 def make_edl_segment(n, time_in, time_out, rec_in, rec_out, full_name, filename, fps=25):
+    timecode = make_timecoder(fps)
     reel = full_name
     if len(full_name) > 7:
         reel = full_name[0:7]
@@ -81,10 +176,10 @@ def make_edl_segment(n, time_in, time_out, rec_in, rec_out, full_name, filename,
     out = template.format(
         n,
         full_name,
-        Timecode(fps, start_seconds=time_in),
-        Timecode(fps, start_seconds=time_out),
-        Timecode(fps, start_seconds=rec_in),
-        Timecode(fps, start_seconds=rec_out),
+        timecode(time_in),
+        timecode(time_out),
+        timecode(rec_in),
+        timecode(rec_out),
         filename,
         full_name,
         reel
@@ -96,17 +191,14 @@ def make_edl_segment(n, time_in, time_out, rec_in, rec_out, full_name, filename,
 def make_edl(timestamps, name):
     '''Converts an array of ordered timestamps into an EDL string'''
 
-    fpses = {}
+    probe_many([timestamp['file'] for timestamp in timestamps])
 
     out = "TITLE: {}\nFCM: NON-DROP FRAME\n\n".format(name)
 
     rec_in = 0
 
     for index, timestamp in enumerate(timestamps):
-        if timestamp['file'] not in fpses:
-            fpses[timestamp['file']] = get_fps(timestamp['file'])
-
-        fps = fpses[timestamp['file']]
+        fps = get_fps(timestamp['file'])
 
         n = str(index + 1).zfill(4)
 
@@ -136,16 +228,13 @@ def make_otio(timestamps, name):
     tr = otio.schema.Track(name="Supercut")
     tl.tracks.append(tr)
 
-
-    filedata = {}
+    probe_many([timestamp['file'] for timestamp in timestamps])
 
     rec_in = 0
 
     for index, timestamp in enumerate(timestamps):
-        if timestamp['file'] not in filedata:
-            filedata[timestamp['file']] = get_fps(timestamp['file']), get_duration(timestamp['file'])
-
-        fps, file_duration = filedata[timestamp['file']]
+        fps = get_fps(timestamp['file'])
+        file_duration = get_duration(timestamp['file'])
 
         n = str(index + 1).zfill(4)
 
@@ -188,45 +277,54 @@ def create_timestamps(inputfiles):
 
 def convert_timespan(timespan):
     """Convert an srt timespan into a start and end timestamp."""
-    start, end = timespan.split('-->')
-    start = convert_timestamp(start)
-    end = convert_timestamp(end)
+    h1, m1, s1, ms1, h2, m2, s2, ms2 = _TIMESPAN_RE.match(timespan).groups()
+    start = int(h1) * 3600 + int(m1) * 60 + int(s1) + int(ms1) / 1000
+    end = int(h2) * 3600 + int(m2) * 60 + int(s2) + int(ms2) / 1000
     return start, end
 
 
 def convert_timestamp(timestamp):
     """Convert an srt timestamp into seconds."""
-    timestamp = timestamp.strip()
-    chunk, millis = timestamp.split(',')
-    hours, minutes, seconds = chunk.split(':')
-    hours = int(hours)
-    minutes = int(minutes)
-    seconds = int(seconds)
-    seconds = seconds + hours * 60 * 60 + minutes * 60 + float(millis) / 1000
-    return seconds
+    hours, minutes, seconds, millis = _TIMESTAMP_RE.match(timestamp.strip()).groups()
+    return int(hours) * 3600 + int(minutes) * 60 + int(seconds) + int(millis) / 1000
 
 
 def clean_srt(srt):
-    """Remove damaging line breaks and numbers from srt files and return a
-    dictionary.
+    """Parse an srt file in a single pass and return a dictionary of timespans
+    and their subtitle text, joined into one line.
     """
-    with open(srt, 'r') as f:
-        text = f.read()
-    text = re.sub(r'^\d+[\n\r]', '', text, flags=re.MULTILINE)
-    lines = text.splitlines()
-    output = OrderedDict()
-    key = ''
-
-    for line in lines:
+    with open(srt, 'rb') as f:
+        data = f.read()
+    if data.startswith(codecs.BOM_UTF8):
+        data = data[len(codecs.BOM_UTF8):]
+
+    # subtitle lines per timespan, joined and decoded once at the end
+    buffers = {}
+    key = None
+    # a number is only an index if the next line is a timespan
+    number = None
+
+    for line in data.splitlines():
         line = line.strip()
-        if line.find('-->') > -1:
+        if b'-->' in line:
+            number = None
             key = line
-            output[key] = ''
+            buffers[key] = []
+            continue
+        if not line or key is None:
+            continue
+        if number is not None:
+            buffers[key].append(number)
+            number = None
+        if line.isdigit():
+            number = line
         else:
-            if key != '':
-                output[key] += line + ' '
+            buffers[key].append(line)
+
+    if number is not None and key is not None:
+        buffers[key].append(number)
 
-    return output
+    return dict((k.decode('utf-8', 'replace'), b' '.join(v).decode('utf-8', 'replace')) for k, v in buffers.items())
 
 
 def cleanup_log_files(outputfile):
@@ -237,67 +335,191 @@ def cleanup_log_files(outputfile):
         os.remove(f)
 
 
+def pad_clips(composition, padding, verbose=False):
+    """Yield the clips of a composition, adding padding to the start of a clip
+    when it overlaps the previous one from the same file. Padded clips are
+    copies, the composition itself is left untouched. If verbose, print out
+    the timespans to be cut followed by their lines.
+    """
+    for (prev, c) in pairwise(chain([None], composition)):
+        if prev is not None and prev['file'] == c['file'] and c['start'] < prev['end']:
+            c = dict(c, start=c['start'] + padding)
+        if verbose:
+            print("{1:.2f} to {2:.2f}:\t{0}".format(c['line'], c['start'], c['end']))
+        yield c
+
+
 def demo_supercut(composition, padding):
     """Print out timespans to be cut followed by the line number in the srt."""
-    for i, c in enumerate(composition):
-        line = c['line']
-        start = c['start']
-        end = c['end']
-        if i > 0 and composition[i - 1]['file'] == c['file'] and start < composition[i - 1]['end']:
-            start = start + padding
-        print("{1:.2f} to {2:.2f}:\t{0}".format(line, start, end))
+    for c in pad_clips(composition, padding, verbose=True):
+        pass
 
 
-def create_supercut(composition, outputfile, padding):
+def create_supercut(composition, outputfile, padding, videofileclips=None, verbose=True):
     """Concatenate video clips together and output finished video file to the
-    output directory.
+    output directory. Source clips already opened in `videofileclips` are
+    reused, and newly opened ones are added to it; if it is not given, the
+    clips are closed once the file is written.
     """
     print("[+] Creating clips.")
-    demo_supercut(composition, padding)
 
-    # add padding when necessary
-    for (clip, nextclip) in zip(composition, composition[1:]):
-        if ((nextclip['file'] == clip['file']) and (nextclip['start'] < clip['end'])):
-            nextclip['start'] += padding
+    owns_clips = videofileclips is None
+    if owns_clips:
+        videofileclips = {}
 
-    # put all clips together:
-    all_filenames = set([c['file'] for c in composition])
-    videofileclips = dict([(f, VideoFileClip(f)) for f in all_filenames])
-    cut_clips = [videofileclips[c['file']].subclip(c['start'], c['end']) for c in composition]
+    try:
+        # add padding when necessary, print and cut each clip in one pass
+        cut_clips = []
+        for c in pad_clips(composition, padding, verbose):
+            if c['file'] not in videofileclips:
+                videofileclips[c['file']] = VideoFileClip(c['file'])
+            cut_clips.append(videofileclips[c['file']].subclip(c['start'], c['end']))
+
+        print("[+] Concatenating clips.")
+        final_clip = concatenate(cut_clips)
+
+        print("[+] Writing ouput file.")
+        final_clip.to_videofile(outputfile, codec="libx264", temp_audiofile=outputfile + '.temp-audio.m4a', remove_temp=True, audio_codec='aac')
+    finally:
+        if owns_clips:
+            for f in list(videofileclips):
+                close_clip(videofileclips.pop(f))
+
+
+def close_clip(clip):
+    """Stop the ffmpeg readers of a source clip. moviepy before 1.0 has no
+    close(); its readers are stopped once the last reference to the clip is
+    dropped, so callers should not keep it around.
+    """
+    close = getattr(clip, 'close', None)
+    if close is not None:
+        close()
+
+
+# source clips opened by a batch worker process, reused by its next batch
+_batch_clips = {}
+
+
+def close_batch_clips(filenames=None):
+    """Close the source clips opened by this batch worker, or only those of
+    the given files.
+    """
+    if filenames is None:
+        filenames = list(_batch_clips)
+    for f in filenames:
+        clip = _batch_clips.pop(f, None)
+        if clip is not None:
+            close_clip(clip)
+            del clip
+
+
+def init_batch_worker():
+    """Close the source clips when the batch worker process exits. Unlike
+    atexit, multiprocessing finalizers also run in forked workers.
+    """
+    multiprocessing.util.Finalize(None, close_batch_clips, exitpriority=10)
 
-    print("[+] Concatenating clips.")
-    final_clip = concatenate(cut_clips)
 
-    print("[+] Writing ouput file.")
-    final_clip.to_videofile(outputfile, codec="libx264", temp_audiofile='temp-audio.m4a', remove_temp=True, audio_codec='aac')
+def render_batch(composition, outputfile, padding):
+    """Render one batch of a supercut inside a worker process, without
+    reopening the source videos the previous batch has already opened. Videos
+    this batch doesn't use are closed first, so a worker never holds more
+    than one batch's files open.
+    """
+    files = set([c['file'] for c in composition])
+    close_batch_clips([f for f in _batch_clips if f not in files])
+    try:
+        create_supercut(composition, outputfile, padding, videofileclips=_batch_clips, verbose=False)
+    except:
+        # don't reuse readers a failed batch may have left in a bad state
+        close_batch_clips(files)
+        raise
+
 
+def same_format(filenames, cache=True):
+    """Return True if all videos share video codec, resolution and frame rate
+    as well as audio codec, sample rate and channels, so their streams can be
+    concatenated without re-encoding. Pass cache=False for files written
+    during this run.
+    """
+    video_keys = ('codec_name', 'width', 'height', 'r_frame_rate')
+    audio_keys = ('codec_name', 'sample_rate', 'channels')
+    formats = set()
+    for entries in probe_many(filenames, cache).values():
+        video = entries.get('video', {})
+        audio = entries.get('audio', {})
+        if None in [video.get(k) for k in video_keys]:
+            return False
+        formats.add((tuple(video.get(k) for k in video_keys), tuple(audio.get(k) for k in audio_keys)))
+    return len(formats) == 1
+
+
+def concatenate_files(filenames, outputfile):
+    """Join video files with ffmpeg's concat demuxer without re-encoding.
+    All files need to share the same codecs.
+    """
+    fd, listfile = tempfile.mkstemp(suffix='.txt')
+    try:
+        with os.fdopen(fd, 'w') as outfile:
+            for filename in filenames:
+                outfile.write("file '{}'\n".format(os.path.abspath(filename).replace("'", "'\\''")))
+        subprocess.run([FFMPEG_BINARY, '-y', '-v', 'error', '-f', 'concat', '-safe', '0', '-i', listfile, '-c', 'copy', outputfile], check=True)
+    finally:
+        os.remove(listfile)
+
+
+def create_supercut_ffmpeg(composition, outputfile, padding, verbose=True):
+    """Cut clips with ffmpeg and join them with the concat demuxer, copying
+    the streams instead of decoding and re-encoding every frame.
+    """
+    print("[+] Creating clips.")
+
+    tempdir = tempfile.mkdtemp()
+    try:
+        # add padding when necessary, print and cut each clip in one pass
+        segments = []
+        for i, c in enumerate(pad_clips(composition, padding, verbose)):
+            segment = os.path.join(tempdir, 'seg_' + str(i).zfill(5) + '.ts')
+            subprocess.run([FFMPEG_BINARY, '-y', '-v', 'error', '-ss', str(max(c['start'], 0)), '-to', str(c['end']), '-i', c['file'], '-c', 'copy', '-avoid_negative_ts', '1', segment], check=True)
+            segments.append(segment)
+
+        print("[+] Concatenating clips.")
+        concatenate_files(segments, outputfile)
+    finally:
+        shutil.rmtree(tempdir)
 
 
 def create_supercut_in_batches(composition, outputfile, padding):
     """Create & concatenate video clips in groups of size BATCH_SIZE and output
     finished video file to output directory.
     """
-    total_clips = len(composition)
-    start_index = 0
-    end_index = BATCH_SIZE
-    batch_comp = []
-    while start_index < total_clips:
-        filename = outputfile + '.tmp' + str(start_index) + '.mp4'
-        try:
-            create_supercut(composition[start_index:end_index], filename, padding)
-            batch_comp.append(filename)
-            gc.collect()
-            start_index += BATCH_SIZE
-            end_index += BATCH_SIZE
-        except:
-            start_index += BATCH_SIZE
-            end_index += BATCH_SIZE
-            next
-
-    clips = [VideoFileClip(filename) for filename in batch_comp]
-    video = concatenate(clips)
-    video.to_videofile(outputfile, codec="libx264", temp_audiofile='temp-audio.m4a', remove_temp=True, audio_codec='aac')
-
+    batches = [(composition[i:i + BATCH_SIZE], outputfile + '.tmp' + str(i) + '.mp4') for i in range(0, len(composition), BATCH_SIZE)]
+
+    # render the batches in parallel, one x264 encoder per worker
+    with ProcessPoolExecutor(max_workers=min(4, os.cpu_count() or 1), initializer=init_batch_worker) as executor:
+        futures = [executor.submit(render_batch, batch, filename, padding) for batch, filename in batches]
+
+        # the workers render quietly, list each batch's clips here in order
+        batch_comp = []
+        for future, (batch, filename) in zip(futures, batches):
+            try:
+                future.result()
+                demo_supercut(batch, padding)
+                batch_comp.append(filename)
+            except:
+                continue
+
+    # moviepy renders each batch at the size and frame rate of its first clip,
+    # so the batches can only be stream-copied if those match
+    if same_format(batch_comp, cache=False):
+        concatenate_files(batch_comp, outputfile)
+    else:
+        clips = [VideoFileClip(filename) for filename in batch_comp]
+        video = concatenate(clips)
+        video.to_videofile(outputfile, codec="libx264", temp_audiofile=outputfile + '.temp-audio.m4a', remove_temp=True, audio_codec='aac')
+        for clip in clips:
+            close_clip(clip)
+        del clips, video
 
     # remove partial video files
     for filename in batch_comp:
@@ -318,9 +540,49 @@ def split_clips(composition, outputfile):
         clip.to_videofile(clipfilename, codec="libx264", temp_audiofile='temp-audio.m4a', remove_temp=True, audio_codec='aac')
 
 
+class MultiTermSearch(object):
+    """Matches any of several literal terms in a single pass over a line, using
+    an Aho-Corasick automaton (requires pyahocorasick).
+    """
+
+    def __init__(self, terms):
+        import ahocorasick
+
+        self.pattern = '|'.join(terms)
+        self.automaton = ahocorasick.Automaton()
+        for term in terms:
+            self.automaton.add_word(term, term)
+        self.automaton.make_automaton()
+
+    def search(self, line):
+        for match in self.automaton.iter(line):
+            return True
+        return False
+
+
+def compile_search(search, searchtype):
+    """Compile the search term once for regex based search types, so it isn't
+    looked up again for every subtitle line.
+    """
+    if searchtype == 'word' and '|' in search:
+        # plain word lists don't need the regex engine
+        terms = search.split('|')
+        if all(t and not any(c in '.^$*+?{}[]\\|()' for c in t) for t in terms):
+            try:
+                return MultiTermSearch(terms)
+            except ImportError:
+                pass
+
+    if searchtype == 're' or searchtype == 'word':
+        return re.compile(search)  #, re.IGNORECASE)
+    return search
+
+
 def search_line(line, search, searchtype):
     """Return True if search term is found in given line, False otherwise."""
-    if searchtype == 're' or searchtype == 'word':
+    if isinstance(search, (re.Pattern, MultiTermSearch)):
+        return search.search(line)
+    elif searchtype == 're' or searchtype == 'word':
         return re.search(search, line)  #, re.IGNORECASE)
     elif searchtype == 'pos':
         return searcher.search_out(line, search)
@@ -328,6 +590,22 @@ def search_line(line, search, searchtype):
         return searcher.hypernym_search(line, search)
 
 
+def list_dirs(paths):
+    """Return the set of file names in each directory containing one of the
+    given paths, scanning every directory only once.
+    """
+    listings = {}
+    for path in paths:
+        d = os.path.dirname(path)
+        if d not in listings:
+            try:
+                with os.scandir(d or '.') as entries:
+                    listings[d] = set([e.name for e in entries if e.is_file()])
+            except OSError:
+                listings[d] = set()
+    return listings
+
+
 def get_subtitle_files(inputfile):
     """Return a list of subtitle files."""
     srts = []
@@ -350,10 +628,14 @@ def get_vtt_files(inputfile):
     """Return a list of vtt files."""
     vtts = []
 
-    for f in inputfile:
-        filename = f.split('.')
-        filename = '.'.join(filename[0:-1])
-        vtt = glob(filename + '*.vtt')
+    stems = ['.'.join(f.split('.')[0:-1]) for f in inputfile]
+    listings = list_dirs(stems)
+    vtt_names = dict([(d, sorted([name for name in names if name.endswith('.vtt')])) for d, names in listings.items()])
+
+    for f, stem in zip(inputfile, stems):
+        d = os.path.dirname(stem)
+        prefix = os.path.basename(stem)
+        vtt = [os.path.join(d, name) for name in vtt_names[d] if name.startswith(prefix)]
         if len(vtt) > 0:
             vtts.append({'vtt': vtt[0], 'video': f})
 
@@ -364,67 +646,94 @@ def get_vtt_files(inputfile):
     return vtts
 
 
-def compose_from_srts(srts, search, searchtype):
-    """Takes a list of subtitle (srt) filenames, search term and search type
-    and, returns a list of timestamps for composing a supercut.
+def search_srt(srt, search, searchtype, log=print):
+    """Search a single subtitle (srt) file and return the timestamps of the
+    matching lines. `search` may be a pattern from compile_search. Status
+    messages are passed to `log`.
     """
     composition = []
     foundSearchTerm = False
 
-    # Iterate over each subtitles file.
-    for srt in srts:
+    log(srt)
+    lines = clean_srt(srt)
 
-        print(srt)
-        lines = clean_srt(srt)
+    videofile = ""
+    foundVideoFile = False
 
-        videofile = ""
-        foundVideoFile = False
+    log("[+] Searching for video file corresponding to '" + srt + "'.")
+    for ext in usable_extensions:
+        tempVideoFile = srt.replace('.srt', '.' + ext)
+        if os.path.isfile(tempVideoFile):
+            videofile = tempVideoFile
+            foundVideoFile = True
+            log("[+] Found '" + tempVideoFile + "'.")
 
-        print("[+] Searching for video file corresponding to '" + srt + "'.")
-        for ext in usable_extensions:
-            tempVideoFile = srt.replace('.srt', '.' + ext)
-            if os.path.isfile(tempVideoFile):
-                videofile = tempVideoFile
-                foundVideoFile = True
-                print("[+] Found '" + tempVideoFile + "'.")
+    # If a correspndong video file was found for this subtitles file...
+    if foundVideoFile:
 
-        # If a correspndong video file was found for this subtitles file...
-        if foundVideoFile:
+        # Check that the subtitles file contains subtitles.
+        if lines:
 
-            # Check that the subtitles file contains subtitles.
-            if lines:
+            # Iterate over each line in the current subtitles file.
+            for timespan in lines.keys():
+                line = lines[timespan].strip()
 
-                # Iterate over each line in the current subtitles file.
-                for timespan in lines.keys():
-                    line = lines[timespan].strip()
+                # If this line contains the search term
+                if search_line(line, search, searchtype):
 
-                    # If this line contains the search term
-                    if search_line(line, search, searchtype):
+                    foundSearchTerm = True
 
-                        foundSearchTerm = True
+                    # Extract the timespan for this subtitle.
+                    start, end = convert_timespan(timespan)
 
-                        # Extract the timespan for this subtitle.
-                        start, end = convert_timespan(timespan)
+                    # Record this occurance of the search term.
+                    composition.append({'file': videofile, 'time': timespan, 'start': start, 'end': end, 'line': line})
 
-                        # Record this occurance of the search term.
-                        composition.append({'file': videofile, 'time': timespan, 'start': start, 'end': end, 'line': line})
+            # If the search was unsuccessful.
+            if foundSearchTerm is False:
+                log("[!] Search term '" + getattr(search, 'pattern', search) + "'" + " was not found is subtitle file '" + srt + "'.")
 
-                # If the search was unsuccessful.
-                if foundSearchTerm is False:
-                    print("[!] Search term '" + search + "'" + " was not found is subtitle file '" + srt + "'.")
+        # If no subtitles were found in the current file.
+        else:
+            log("[!] Subtitle file '" + srt + "' is empty.")
 
-            # If no subtitles were found in the current file.
-            else:
-                print("[!] Subtitle file '" + srt + "' is empty.")
+    # If no video file was found...
+    else:
+        log("[!] No video file was found which corresponds to subtitle file '" + srt + "'.")
+        log("[!] The following video formats are currently supported:")
+        extList = ""
+        for ext in usable_extensions:
+            extList += ext + ", "
+        log(extList)
 
-        # If no video file was found...
-        else:
-            print("[!] No video file was found which corresponds to subtitle file '" + srt + "'.")
-            print("[!] The following video formats are currently supported:")
-            extList = ""
-            for ext in usable_extensions:
-                extList += ext + ", "
-            print(extList)
+    return composition
+
+
+def compose_from_srts(srts, search, searchtype):
+    """Takes a list of subtitle (srt) filenames, search term and search type
+    and, returns a list of timestamps for composing a supercut.
+    """
+    composition = []
+    pattern = compile_search(search, searchtype)
+
+    # pos and hyper searches run pattern's python parser, which holds the GIL
+    # and isn't safe to load from several threads
+    if searchtype not in ('re', 'word'):
+        for srt in srts:
+            composition.extend(search_srt(srt, pattern, searchtype))
+        return composition
+
+    def search_file(srt):
+        messages = []
+        return search_srt(srt, pattern, searchtype, log=messages.append), messages
+
+    # Search the subtitles files in parallel; map keeps the input order, so the
+    # messages of each file are printed together and in order.
+    with ThreadPoolExecutor(max_workers=os.cpu_count()) as executor:
+        for segments, messages in executor.map(search_file, srts):
+            for message in messages:
+                print(message)
+            composition.extend(segments)
 
     return composition
 
@@ -462,38 +771,37 @@ def compose_from_transcript(files, search, searchtype):
 
 def compose_from_vtt(files, search, searchtype):
     final_segments = []
+    pattern = compile_search(search, searchtype)
 
     for f in files:
         video = f['video']
 
         with open(f['vtt'], 'r') as infile:
-            sentences = parse_auto_sub(infile.read())
-
-        for sentence in sentences:
-            if searchtype in ['word', 'hyper', 'pos']:
-                for word in sentence['words']:
-                    if search_line(word['word'], search, searchtype):
+            for sentence in parse_auto_sub_iter(infile):
+                if searchtype in ['word', 'hyper', 'pos']:
+                    for word in sentence['words']:
+                        if search_line(word['word'], pattern, searchtype):
+                            seg = {
+                                'file': video,
+                                'line': word['word'],
+                                'start': word['start'],
+                                'end': word['end']
+                            }
+                            final_segments.append(seg)
+                else:
+                    if search_line(sentence['text'], pattern, searchtype):
                         seg = {
                             'file': video,
-                            'line': word['word'],
-                            'start': word['start'],
-                            'end': word['end']
+                            'line': sentence['text'],
+                            'start': sentence['start'],
+                            'end': sentence['end']
                         }
                         final_segments.append(seg)
-            else:
-                if search_line(sentence['text'], search, searchtype):
-                    seg = {
-                        'file': video,
-                        'line': sentence['text'],
-                        'start': sentence['start'],
-                        'end': sentence['end']
-                    }
-                    final_segments.append(seg)
 
     return final_segments
 
 
-def videogrep(inputfile, outputfile, search, searchtype, maxclips=0, padding=0, test=False, randomize=False, sync=0, use_transcript=False, use_vtt=False, export_clips=False):
+def videogrep(inputfile, outputfile, search, searchtype, maxclips=0, padding=0, test=False, randomize=False, sync=0, use_transcript=False, use_vtt=False, export_clips=False, stream_copy=False):
     """Search through and find all instances of the search term in an srt or transcript,
     create a supercut around that instance, and output a new video file
     comprised of those supercuts.
@@ -543,11 +851,23 @@ def videogrep(inputfile, outputfile, search, searchtype, maxclips=0, padding=0,
             elif export_clips:
                 split_clips(composition, outputfile)
             else:
-                if len(composition) > BATCH_SIZE:
-                    print("[+] Starting batch job.")
-                    create_supercut_in_batches(composition, outputfile, padding)
-                else:
-                    create_supercut(composition, outputfile, padding)
+                copied = False
+                if stream_copy:
+                    if same_format([c['file'] for c in composition]):
+                        try:
+                            create_supercut_ffmpeg(composition, outputfile, padding)
+                            copied = True
+                        except (OSError, subprocess.CalledProcessError):
+                            print("[!] Could not cut clips with ffmpeg; re-encoding them instead.")
+                    else:
+                        print("[!] Videos differ in format; re-encoding them instead.")
+
+                if not copied:
+                    if len(composition) > BATCH_SIZE:
+                        print("[+] Starting batch job.")
+                        create_supercut_in_batches(composition, outputfile, padding)
+                    else:
+                        create_supercut(composition, outputfile, padding)
 
 
 def main():
@@ -562,6 +882,7 @@ def main():
     parser.add_argument('--max-clips', '-m', dest='maxclips', type=int, default=0, help='maximum number of clips to use for the supercut')
     parser.add_argument('--output', '-o', dest='outputfile', default='supercut.mp4', help='name of output file')
     parser.add_argument('--export-clips', '-ec', dest='export_clips', action='store_true', help='Export individual clips')
+    parser.add_argument('--stream-copy', '-sc', dest='stream_copy', action='store_true', help='cut clips without re-encoding; much faster, but clips start at the keyframe before each match')
     parser.add_argument('--demo', '-d', action='store_true', help='show results without making the supercut')
     parser.add_argument('--randomize', '-r', action='store_true', help='randomize the clips')
     parser.add_argument('--youtube', '-yt', help='grab clips from youtube based on your search')
@@ -585,7 +906,7 @@ def main():
         for ngram, count in most_common:
             print(' '.join(ngram), count)
     else:
-        videogrep(args.inputfile, args.outputfile, args.search, args.searchtype, args.maxclips, args.padding, args.demo, args.randomize, args.sync, args.use_transcript, args.use_vtt, args.export_clips)
+        videogrep(args.inputfile, args.outputfile, args.search, args.searchtype, args.maxclips, args.padding, args.demo, args.randomize, args.sync, args.use_transcript, args.use_vtt, args.export_clips, args.stream_copy)
 
 
 if __name__ == '__main__':
@@ -3,6 +3,7 @@ from __future__ import print_function
 from __future__ import unicode_literals
 
 import re
+from itertools import chain
 from bs4 import BeautifulSoup
 
 def timestamp_to_secs(ts):
@@ -17,8 +18,17 @@ def secs_to_timestamp(secs):
 
 
 def parse_cued(data):
-    out = []
+    return list(parse_cued_iter(data))
+
+
+def parse_cued_iter(data):
+    '''
+    Yields sentences from (meta, content) line pairs one at a time. Each
+    sentence is held back until the next one is parsed, since its last word
+    may have to end where the next sentence starts.
+    '''
     pat = r'<(\d\d:\d\d:\d\d(\.\d+)?)>'
+    previous = None
 
     for lines in data:
         meta, content = lines
@@ -44,49 +54,55 @@ def parse_cued(data):
             start = item['end']
 
         sentence['text'] = ' '.join([w['word'] for w in sentence['words']])
-        out.append(sentence)
 
-    for index, sentence in enumerate(out):
-        if index == 0:
-            sentence['start'] = sentence['words'][0]['start']
-            sentence['end'] = sentence['words'][-1]['end']
-            continue
+        if previous is not None:
+            first_word = sentence['words'][0]
+            last_word = previous['words'][-1]
 
-        first_word = sentence['words'][0]
-        last_word = out[index-1]['words'][-1]
+            if last_word['end'] > first_word['start']:
+                last_word['end'] = first_word['start']
 
-        if last_word['end'] > first_word['start']:
-            last_word['end'] = first_word['start']
+            yield previous
 
         sentence['start'] = sentence['words'][0]['start']
         sentence['end'] = sentence['words'][-1]['end']
+        previous = sentence
 
-    return out
+    if previous is not None:
+        yield previous
 
 
 def parse_uncued(data):
-    out = []
-    data = [d.strip() for d in data.split('\n') if d.strip() != '']
-    out = [{'text': '', 'start': None, 'end': None}]
-    for i, line in enumerate(data):
+    return list(parse_uncued_iter(data.split('\n')))
+
+
+def parse_uncued_iter(lines):
+    '''
+    Yields sentences of a plain webvtt file from an iterable of lines
+    '''
+    out = {'text': '', 'start': None, 'end': None}
+    for line in lines:
+        line = line.strip()
+        if line == '':
+            continue
         if ' --> ' in line:
             start, end = line.split(' --> ')
             end = end.split(' ')[0]
             start = timestamp_to_secs(start)
             end = timestamp_to_secs(end)
-            if out[-1]['start'] is None:
-                out[-1]['start'] = start
-                out[-1]['end'] = end
+            if out['start'] is None:
+                out['start'] = start
+                out['end'] = end
             else:
-                out.append({'text': '', 'start': start, 'end': end})
+                out['text'] = out['text'].strip()
+                yield out
+                out = {'text': '', 'start': start, 'end': end}
         else:
-            if out[-1]['start'] is not None:
-                out[-1]['text'] += ' ' + line.strip()
+            if out['start'] is not None:
+                out['text'] += ' ' + line
 
-    for o in out:
-        o['text'] = o['text'].strip()
-
-    return out
+    out['text'] = out['text'].strip()
+    yield out
 
 
 def parse_auto_sub(text):
@@ -94,23 +110,44 @@ def parse_auto_sub(text):
     Parses webvtt and returns timestamps for words and lines
     Tested on automatically generated subtitles from YouTube
     '''
+    return list(parse_auto_sub_iter(text.split('\n')))
 
-    pat = r'<(\d\d:\d\d:\d\d(\.\d+)?)>'
-    out = []
-
-    lines = []
-    data = text.split('\n')
-    data = [d for d in data if re.search(r'\d\d:\d\d:\d\d', d) is not None]
-    for i, d in enumerate(data):
-        if re.search(pat, d):
-            lines.append((data[i-1], d))
 
-    if len(lines) > 0:
-        out = parse_cued(lines)
+def parse_auto_sub_iter(lines):
+    '''
+    Like parse_auto_sub, but reads the webvtt from an iterable of lines (such
+    as an open file) and yields sentences as they are parsed, so the whole
+    file is never held in memory.
+    Plain files are only recognized once no cued line has been found, so
+    their lines are buffered until the end of the file.
+    '''
+    pat = re.compile(r'<(\d\d:\d\d:\d\d(\.\d+)?)>')
+    timestamp_pat = re.compile(r'\d\d:\d\d:\d\d')
+
+    def cued_lines(lines):
+        previous = None
+        for d in lines:
+            if timestamp_pat.search(d) is None:
+                continue
+            if pat.search(d) and previous is not None:
+                yield (previous, d)
+            previous = d
+
+    lines = (line.rstrip('\r\n') for line in lines)
+
+    # look for the first cued line, keeping what was read for plain files
+    buffered = []
+    for d in lines:
+        buffered.append(d)
+        if pat.search(d) and timestamp_pat.search(d):
+            break
     else:
-        out = parse_uncued(text)
+        for sentence in parse_uncued_iter(buffered):
+            yield sentence
+        return
 
-    return out
+    for sentence in parse_cued_iter(cued_lines(chain(buffered, lines))):
+        yield sentence
 
 
 def convert_to_srt(sentence):